@@ -0,0 +1,36 @@
+"""
+待ち行列カーネル（sim_core._assign_waits）と集計カーネル（sim_core._summarize）を事前コンパイル（AOT）して
+sim_kernel 拡張モジュールを生成するビルドスクリプト。
+
+デプロイ環境のビルド時に一度だけ実行する：
+    python build_sim_kernel.py
+生成物があれば sim_core はそれを読み込み、初回実行時の JIT コンパイルを省く。
+ただし AOT 版は GIL を保持するため、スレッド並列（シナリオ比較・信頼区間）は逐次に近くなる。
+デプロイでは SIM_KERNEL_AOT=1 のときだけ実行する（render-build.sh）。
+（生成物はプラットフォーム依存のため、リポジトリにはコミットしない）
+"""
+import os
+
+from numba.pycc import CC
+
+import sim_core
+
+cc = CC("sim_kernel")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+cc.export(
+    "assign_waits",
+    "Tuple((i8, b1))(f4[::1], f8, f4[::1], i8, f8, f4[::1])",
+)(sim_core._assign_waits.py_func)
+cc.export("summarize", "Tuple((f8, f8, i8))(f4[::1], f8)")(sim_core._summarize.py_func)
+
+# ビルド時点のカーネルのソースハッシュを埋め込み、sim_core が古い生成物を使わないようにする
+_SOURCE_HASH = sim_core._kernel_source_hash()
+
+def source_hash():
+    return _SOURCE_HASH
+
+cc.export("source_hash", "i8()")(source_hash)
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"sim_kernel を {cc.output_dir} に生成しました。")
@@ -1,11 +1,4 @@
 import streamlit as st
-import simpy
-import random
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import os
-import matplotlib.font_manager as fm
 
 # --- 1. ブランド設定 ---
 st.set_page_config(
@@ -15,98 +8,115 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# --- 日本語フォント ---
-font_path = "./NotoSansJP-Regular.ttf"
-if os.path.exists(font_path):
-    fm.fontManager.addfont(font_path)
-    prop = fm.FontProperties(fname=font_path)
-    plt.rcParams["font.family"] = prop.get_name()
-    plt.rcParams["axes.unicode_minus"] = False
-
 # --- URLパラメータ（既存互換） ---
-query_params = st.query_params
-default_orders = int(query_params.get("orders", 60))
-default_staff  = int(query_params.get("staff", 3))
-default_time   = float(query_params.get("time", 2.5))
-
-# --- シミュレーション（核） ---
-def packing_process(env, packer_resource, packing_time_mean, wait_times):
-    arrival_time = env.now
-    with packer_resource.request() as request:
-        yield request
-        wait_times.append(env.now - arrival_time)
-
-        std_dev = packing_time_mean * 0.2
-        service_time = max(0.1, random.gauss(packing_time_mean, std_dev))
-        yield env.timeout(service_time)
-
-def setup(env, num_packers, arrival_interval, packing_time_mean, wait_times):
-    packer_resource = simpy.Resource(env, capacity=num_packers)
-    while True:
-        yield env.timeout(random.expovariate(1.0 / arrival_interval))
-        env.process(packing_process(env, packer_resource, packing_time_mean, wait_times))
-
-def run_simulation(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, seed=42):
-    # 再現性重視
-    random.seed(seed)
-    wait_times = []
-    env = simpy.Environment()
-    arrival_interval = 60.0 / avg_orders_per_hour
-    env.process(setup(env, num_packers, arrival_interval, avg_packing_time, wait_times))
-    env.run(until=sim_hours * 60)
-    return np.array(wait_times)
-
-# --- 指標計算 ---
-def evaluate(wait_times, sla_min, loss_per_order_yen, workdays=20):
-    total = int(len(wait_times))
-    if total == 0:
-        return {
-            "total_orders": 0,
-            "avg_wait": 0.0,
-            "max_wait": 0.0,
-            "delay_rate": 0.0,
-            "late_orders": 0,
-            "daily_loss": 0,
-            "monthly_loss": 0
+# 同じクエリ文字列なら解析結果をキャッシュから返す
+# 戻り値は不変のタプルなので cache_resource で同じオブジェクトを共有する（cache_data の pickle 往復を省く）
+# キーはクエリ文字列そのものなので、別の URL で開いたセッションに値が混ざることはない
+# プロセス全体で共有されるため、任意のクエリ文字列で無制限に増えないよう件数を制限する
+@st.cache_resource(show_spinner=False, max_entries=64)
+def parse_params(qp_items):
+    d = dict(qp_items)
+    # seed は任意の再現性用パラメータなので、整数でない・負の値でもページを壊さず既定値に戻す
+    try:
+        seed = int(d.get("seed", 42))
+    except ValueError:
+        seed = 42
+    if seed < 0:
+        seed = 42
+    return int(d.get("orders", 60)), int(d.get("staff", 3)), float(d.get("time", 2.5)), seed
+
+# seed は乱数の再現性用（既定 42、0以上）。?seed= で別の標本パスを確認できる
+default_orders, default_staff, default_time, seed = parse_params(tuple(sorted(st.query_params.to_dict().items())))
+
+# --- 波動シナリオ集計 ---
+# 入力はすべてプリミティブなので、同一条件での再実行（再描画）はキャッシュから返す
+@st.cache_data(show_spinner=False)
+def compute_scenarios(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, sla, loss_per_order, workdays,
+                      peak_orders_mult, peak_time_mult, off_orders_mult, target_delay_rate, max_wait_limit,
+                      optimize_each_scenario, seed=42):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import pandas as pd
+    from sim_core import run_simulation, evaluate, recommend_staff_dual
+
+    scenarios = [
+        ("通常", 1.0, 1.0, num_packers),
+        ("繁忙", peak_orders_mult, peak_time_mult, num_packers),
+        ("低調", off_orders_mult, 1.0, num_packers),
+    ]
+
+    def run_scenario(name, o_mult, t_mult, staff):
+        orders = max(1, int(round(avg_orders_per_hour * o_mult)))
+        ptime = max(0.1, float(avg_packing_time * t_mult))
+
+        wt = run_simulation(orders, staff, ptime, sim_hours, seed=seed)
+        m = evaluate(wt, sla, loss_per_order, workdays=workdays)
+
+        row = {
+            "シナリオ": name,
+            "注文数(件/時)": orders,
+            "梱包時間(分)": round(ptime, 2),
+            "スタッフ(人)": staff,
+            "遅延率(%)": round(m["delay_rate"], 1),
+            f"月間損失({workdays}日)": m["monthly_loss"],
+            "最大待ち(分)": round(m["max_wait"], 2),
+            "平均待ち(分)": round(m["avg_wait"], 2),
+            "遅延件数": m["late_orders"],
+            "総到着件数": m["total_orders"],
         }
+        if not optimize_each_scenario:
+            return row, None, None
 
-    avg_wait = float(np.mean(wait_times))
-    max_wait = float(np.max(wait_times))
-    late = wait_times[wait_times > sla_min]
-    late_count = int(len(late))
-    delay_rate = late_count / total * 100.0
-    daily_loss = int(late_count * loss_per_order_yen)
-    monthly_loss = int(daily_loss * workdays)
-
+        (r_staff, _), (r_staff_mw, mw_value) = recommend_staff_dual(
+            orders, ptime, sim_hours, sla, loss_per_order, target_delay_rate, max_wait_limit,
+            min_staff=1, max_staff=15, seed=seed
+        )
+        opt_row = {
+            "シナリオ": name,
+            "推奨スタッフ(人)": r_staff if r_staff is not None else "15人でも未達",
+            "現在との差": (r_staff - num_packers) if (r_staff is not None) else "-"
+        }
+        opt_row_mw = {
+            "シナリオ": name,
+            "推奨スタッフ(人)": r_staff_mw if r_staff_mw is not None else "15人でも未達",
+            "最大待ち(分)": round(mw_value, 2) if mw_value is not None else "-",
+            "現在との差": (r_staff_mw - num_packers) if (r_staff_mw is not None) else "-"
+        }
+        return row, opt_row, opt_row_mw
+
+    # シナリオ同士は独立なのでスレッドで並列実行する（シミュレーションのカーネルは nogil）
+    with ThreadPoolExecutor(max_workers=len(scenarios)) as ex:
+        results = list(ex.map(lambda sc: run_scenario(*sc), scenarios))
+    rows = [r for r, _, _ in results]
+    opt_rows = [r for _, r, _ in results]
+    opt_rows_maxwait = [r for _, _, r in results]
+
+    # 表の並び順を固定（通常→繁忙→低調）
+    order_map = {"通常": 0, "繁忙": 1, "低調": 2}
+    df = pd.DataFrame(rows).sort_values("シナリオ", key=lambda s: s.map(order_map)).reset_index(drop=True)
+    if not optimize_each_scenario:
+        return df, None, None
+
+    df_opt = pd.DataFrame(opt_rows).sort_values(
+        "シナリオ", key=lambda s: s.map(order_map)
+    ).reset_index(drop=True)
+    df_opt_mw = pd.DataFrame(opt_rows_maxwait).sort_values(
+        "シナリオ", key=lambda s: s.map(order_map)
+    ).reset_index(drop=True)
+    return df, df_opt, df_opt_mw
+
+# --- 表示用ラベル ---
+# 指標の表示文字列はここでまとめて1回だけ作る（各 metric 呼び出しで個別に整形しない）
+def metric_labels(m):
     return {
-        "total_orders": total,
-        "avg_wait": avg_wait,
-        "max_wait": max_wait,
-        "delay_rate": delay_rate,
-        "late_orders": late_count,
-        "daily_loss": daily_loss,
-        "monthly_loss": monthly_loss
+        "total_orders": f"{m['total_orders']} 件",
+        "avg_wait": f"{m['avg_wait']:.2f} 分",
+        "max_wait": f"{m['max_wait']:.2f} 分",
+        "delay_rate": f"{m['delay_rate']:.1f} %",
+        "daily_loss": f"{m['daily_loss']:,.0f} 円",
+        "monthly_loss": f"{m['monthly_loss']:,.0f} 円",
     }
 
-# --- 人員最適化（目標遅延率を満たす最小人数） ---
-def recommend_staff(avg_orders_per_hour, avg_packing_time, sim_hours, sla, loss_per_order, target_delay_rate,
-                    min_staff=1, max_staff=15, seed=42):
-    for staff in range(min_staff, max_staff + 1):
-        wt = run_simulation(avg_orders_per_hour, staff, avg_packing_time, sim_hours, seed=seed)
-        m = evaluate(wt, sla, loss_per_order)
-        if m["delay_rate"] <= target_delay_rate:
-            return staff, m
-    return None, None
-
-def recommend_staff_by_maxwait(avg_orders_per_hour, avg_packing_time, sim_hours, max_wait_limit,
-                               min_staff=1, max_staff=15, seed=42):
-    for staff in range(min_staff, max_staff + 1):
-        wt = run_simulation(avg_orders_per_hour, staff, avg_packing_time, sim_hours, seed=seed)
-        max_wait = float(np.max(wt)) if len(wt) else 0.0
-        if max_wait <= max_wait_limit:
-            return staff, max_wait
-    return None, None
-
 # --- UI ---
 st.title("📦 物流デジタルツイン診断")
 st.markdown("### 発送ライン・人員配置最適化シミュレーター")
@@ -117,6 +127,20 @@ avg_orders_per_hour = st.sidebar.number_input("1時間あたりの平均注文
 num_packers = st.sidebar.slider("現在のスタッフ数", 1, 15, value=default_staff)
 avg_packing_time = st.sidebar.number_input("平均梱包時間（分）", value=default_time, min_value=0.1, step=0.1)
 sim_hours = st.sidebar.slider("稼働時間（時間）", 1, 24, 8)
+quick_estimate = st.sidebar.checkbox(
+    "解析近似（通常時）", value=False,
+    help="待ち行列理論の近似式（Erlang-C）で通常時の指標と推奨人員を算出します。分布はシミュレーションではなく理論上の形です。"
+         "波動シナリオ比較は常にシミュレーションで計算します。"
+)
+show_ci = st.sidebar.checkbox(
+    "95%信頼区間を表示（30回反復）", value=False,
+    help="乱数を変えて30回シミュレーションし、平均待ち・最大待ちのばらつきを表示します。"
+)
+
+hist_bins = st.sidebar.slider(
+    "待ち時間分布のビン数", 10, 200, 20, 10,
+    help="分布グラフの細かさ。ビン数を増やすと裾（長い待ち）の形を細かく確認できます。"
+)
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("損失換算の設定")
@@ -149,39 +173,106 @@ st.sidebar.caption("""**【免責事項】**
 """)
 
 if st.sidebar.button("シミュレーション実行", use_container_width=True):
+    # 計算用ライブラリは実行時のみ読み込む（ボタン押下前の再描画を軽くする）
+    # sim_core は import 時に Numba カーネルを準備するため、特に初回表示への影響が大きい
+    from sim_core import (
+        run_simulation, evaluate, recommend_staff, recommend_staff_analytic,
+        is_stable, load_factor, SATURATION_RHO, analytical_metrics, analytical_histogram, replicate_ci, wait_histogram,
+    )
+
     # --- ベース（通常） ---
-    wt_base = run_simulation(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, seed=42)
-    m_base = evaluate(wt_base, sla, loss_per_order, workdays=workdays)
+    # 解析近似は定常状態が前提。飽和に近い（ρ≥0.98）と稼働時間内に定常へ達しないため、シミュレーションに切り替える
+    rho = load_factor(avg_orders_per_hour, num_packers, avg_packing_time)
+    use_analytic = quick_estimate and rho < SATURATION_RHO
+    if use_analytic:
+        m_base = analytical_metrics(
+            avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, sla, loss_per_order, workdays=workdays
+        )
+        counts, edges = analytical_histogram(
+            avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, m_base["max_wait"], bins=hist_bins
+        )
+    else:
+        wt_base = run_simulation(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, seed=seed)
+        m_base = evaluate(wt_base, sla, loss_per_order, workdays=workdays)
+        # 等幅ビンで集計し、範囲は 0〜最大待ちで明示
+        counts, edges = wait_histogram(wt_base, hist_bins, 0.0, m_base["max_wait"])
 
     st.header("📊 分析レポート（通常）")
+    if not is_stable(avg_orders_per_hour, num_packers, avg_packing_time):
+        st.error(
+            f"負荷率ρ={rho:.2f}（≥1）— 処理能力が不足しているため定常状態が存在せず、"
+            "待ち時間は稼働時間に比例して伸び続けます。以下は稼働時間内の参考値です。"
+        )
+    elif rho >= SATURATION_RHO:
+        st.error(
+            f"負荷率ρ={rho:.2f}（≥{SATURATION_RHO}）— 処理能力の限界に近く、待ち行列は稼働時間内に落ち着きません。"
+            "以下は稼働時間内のシミュレーション結果で、条件のわずかな変化で大きく悪化します。"
+        )
+    if use_analytic:
+        st.caption("※ 解析近似（Erlang-C / Allen-Cunneen）による理論値です。")
+    elif quick_estimate:
+        st.warning("負荷率が限界に近い（または1以上）ため解析近似は使えません。シミュレーション結果を表示します。")
 
     c1, c2, c3 = st.columns(3)
-    c1.metric("総到着件数（推定）", f"{m_base['total_orders']} 件")
-    c2.metric("平均待ち時間", f"{m_base['avg_wait']:.2f} 分")
-    c3.metric("最大待ち時間", f"{m_base['max_wait']:.2f} 分")
+    labels = metric_labels(m_base)
+    c1.metric("総到着件数（推定）", labels["total_orders"])
+    c2.metric("平均待ち時間", labels["avg_wait"])
+    c3.metric("最大待ち時間", labels["max_wait"])
+    if show_ci and use_analytic:
+        st.caption("※ 信頼区間はシミュレーション時のみ表示します（解析近似の理論値には乱数のばらつきがありません）。")
+    elif show_ci:
+        ci = replicate_ci(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, n_reps=30, seed=seed)
+        st.caption(
+            f"30回反復の期待値の95%信頼区間：平均待ち {ci['avg_wait'][1]:.2f}〜{ci['avg_wait'][2]:.2f} 分 ／ "
+            f"最大待ち {ci['max_wait'][1]:.2f}〜{ci['max_wait'][2]:.2f} 分"
+        )
 
     st.markdown("---")
     c4, c5, c6 = st.columns(3)
-    c4.metric("遅延率（SLA超）", f"{m_base['delay_rate']:.1f} %")
-    c5.metric("1日損失額（推定）", f"{m_base['daily_loss']:,.0f} 円")
-    c6.metric(f"月間損失額（{workdays}日換算）", f"{m_base['monthly_loss']:,.0f} 円")
-
-    # 分布
-    fig, ax = plt.subplots()
-    ax.hist(wt_base, bins=20, edgecolor="black")
-    ax.axvline(sla, color="red", linestyle="--", linewidth=2, label="SLA")
-    ax.set_title("待ち時間分布（通常）")
-    ax.set_xlabel("待ち時間（分）")
-    ax.set_ylabel("注文数")
-    ax.legend()
-    st.pyplot(fig)
+    c4.metric("遅延率（SLA超）", labels["delay_rate"])
+    c5.metric("1日損失額（推定）", labels["daily_loss"])
+    c6.metric(f"月間損失額（{workdays}日換算）", labels["monthly_loss"])
+
+    # 分布（Vega-Lite の仕様を dict で直接組み立てる。ビン数分の値だけを送り、描画はブラウザ側）
+    hist_values = [
+        {"start": float(lo), "end": float(hi), "count": int(n)}
+        for lo, hi, n in zip(edges[:-1], edges[1:], counts)
+    ]
+    st.vega_lite_chart({
+        "title": "待ち時間分布（通常）",
+        "layer": [
+            {
+                "data": {"values": hist_values},
+                "mark": {"type": "bar", "stroke": "black", "strokeWidth": 0.5},
+                "encoding": {
+                    "x": {"field": "start", "type": "quantitative", "title": "待ち時間（分）"},
+                    "x2": {"field": "end"},
+                    "y": {"field": "count", "type": "quantitative", "title": "注文数"},
+                },
+            },
+            {
+                "data": {"values": [{"sla": float(sla)}]},
+                "mark": {"type": "rule", "color": "red", "strokeDash": [6, 4], "strokeWidth": 2},
+                "encoding": {"x": {"field": "sla", "type": "quantitative"}},
+            },
+        ],
+    }, use_container_width=True)
+    st.caption(f"赤の破線：SLA（許容待ち時間 {sla:.1f} 分）")
 
     # --- 人員最適化（通常） ---
     st.subheader("🤖 人員最適化提案（通常）")
-    rec_staff, rec_metrics = recommend_staff(
-        avg_orders_per_hour, avg_packing_time, sim_hours, sla, loss_per_order, target_delay_rate,
-        min_staff=1, max_staff=15, seed=42
-    )
+    # 推奨はベースの指標と同じ方法（解析近似／シミュレーション）で判定し、表示と食い違わせない
+    if use_analytic:
+        rec_staff, rec_metrics = recommend_staff_analytic(
+            avg_orders_per_hour, avg_packing_time, sim_hours, sla, loss_per_order, target_delay_rate,
+            min_staff=1, max_staff=15, workdays=workdays
+        )
+        st.caption("※ 推奨人員も解析近似（Erlang-C / Allen-Cunneen）で判定しています。")
+    else:
+        rec_staff, rec_metrics = recommend_staff(
+            avg_orders_per_hour, avg_packing_time, sim_hours, sla, loss_per_order, target_delay_rate,
+            min_staff=1, max_staff=15, seed=seed
+        )
 
     if rec_staff is None:
         st.error("最大15人でも目標遅延率を達成できません。工程改善（作業時間短縮・工程分割・レイアウト等）が必要です。")
@@ -198,151 +289,52 @@ if st.sidebar.button("シミュレーション実行", use_container_width=True)
     if enable_scenarios:
         st.markdown("---")
         st.header("📈 波動シナリオ比較（④）")
+        if use_analytic:
+            st.caption("※ シナリオ比較はシミュレーション結果です（通常の行も上の解析近似とは別に計算しています）。")
 
-        scenarios = [
-            ("通常", 1.0, 1.0, num_packers),
-            ("繁忙", peak_orders_mult, peak_time_mult, num_packers),
-            ("低調", off_orders_mult, 1.0, num_packers),
-        ]
+        df, df_opt, df_opt_mw = compute_scenarios(
+            avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, sla, loss_per_order, workdays,
+            peak_orders_mult, peak_time_mult, off_orders_mult, target_delay_rate, max_wait_limit,
+            optimize_each_scenario, seed=seed
+        )
 
-        # --- シナリオ結果の集計（表示はループ外で1回だけ） ---
-        rows = []
-        opt_rows = []
-        opt_rows_maxwait = []
-        
-        for name, o_mult, t_mult, staff in scenarios:
-            orders = max(1, int(round(avg_orders_per_hour * o_mult)))
-            ptime = max(0.1, float(avg_packing_time * t_mult))
-        
-            wt = run_simulation(orders, staff, ptime, sim_hours, seed=42)
-            m = evaluate(wt, sla, loss_per_order, workdays=workdays)
-        
-            rows.append({
-                "シナリオ": name,
-                "注文数(件/時)": orders,
-                "梱包時間(分)": round(ptime, 2),
-                "スタッフ(人)": staff,
-                "遅延率(%)": round(m["delay_rate"], 1),
-                f"月間損失({workdays}日)": m["monthly_loss"],
-                "最大待ち(分)": round(m["max_wait"], 2),
-                "平均待ち(分)": round(m["avg_wait"], 2),
-                "遅延件数": m["late_orders"],
-                "総到着件数": m["total_orders"],
-            })
-        
-            if optimize_each_scenario:
-                r_staff, _ = recommend_staff(
-                    orders, ptime, sim_hours, sla, loss_per_order, target_delay_rate,
-                    min_staff=1, max_staff=15, seed=42
-                )
-                opt_rows.append({
-                    "シナリオ": name,
-                    "推奨スタッフ(人)": r_staff if r_staff is not None else "15人でも未達",
-                    "現在との差": (r_staff - num_packers) if (r_staff is not None) else "-"
-                })
-                r_staff_mw, mw_value = recommend_staff_by_maxwait(
-                    orders, ptime, sim_hours, max_wait_limit,
-                    min_staff=1, max_staff=15, seed=42
-                )
-                opt_rows_maxwait.append({
-                    "シナリオ": name,
-                    "推奨スタッフ(人)": r_staff_mw if r_staff_mw is not None else "15人でも未達",
-                    "最大待ち(分)": round(mw_value, 2) if mw_value is not None else "-",
-                    "現在との差": (r_staff_mw - num_packers) if (r_staff_mw is not None) else "-"
-                })
-        
-        
-        # --- ここから先は「ループ外」：表は1回だけ表示 ---
-        df = pd.DataFrame(rows)
-        
-        # 表の並び順を固定（通常→繁忙→低調）
-        order_map = {"通常": 0, "繁忙": 1, "低調": 2}
-        df = df.sort_values("シナリオ", key=lambda s: s.map(order_map)).reset_index(drop=True)
-        
         money_col = f"月間損失({workdays}日)"
         
-        # 数値のままカンマ表示（ソートも壊れにくい）
+        # 数値のままカンマ表示（ソートも壊れにくい）。表示形式は column_config で指定し、Styler を使わず軽量に描画
+        fmt_map = {
+            money_col: "localized",
+            "注文数(件/時)": "localized",
+            "遅延件数": "localized",
+            "総到着件数": "localized",
+            "最大待ち(分)": "%.2f",
+            "平均待ち(分)": "%.2f",
+            "遅延率(%)": "%.1f",
+            "梱包時間(分)": "%.2f",
+            "スタッフ(人)": "%d",
+        }
         st.dataframe(
-            df.style.format({
-                money_col: "{:,.0f}",
-                "注文数(件/時)": "{:,.0f}",
-                "遅延件数": "{:,.0f}",
-                "総到着件数": "{:,.0f}",
-                "最大待ち(分)": "{:,.2f}",
-                "平均待ち(分)": "{:,.2f}",
-                "遅延率(%)": "{:,.1f}",
-                "梱包時間(分)": "{:,.2f}",
-                "スタッフ(人)": "{:,.0f}",
-            }),
-            use_container_width=True
+            df, use_container_width=True,
+            column_config={col: st.column_config.NumberColumn(format=fmt) for col, fmt in fmt_map.items()}
         )
         
         # （任意）シナリオ別の推奨人員表
         if optimize_each_scenario:
             st.subheader("🧭 シナリオ別：推奨人員（目標遅延率ベース）")
-            df_opt = pd.DataFrame(opt_rows).sort_values(
-                "シナリオ", key=lambda s: s.map(order_map)
-            ).reset_index(drop=True)
             st.dataframe(df_opt, use_container_width=True)
 
             st.subheader("🧭 シナリオ別：推奨人員（締切遵守（最大待ち）ベース）")
-            df_opt_mw = pd.DataFrame(opt_rows_maxwait).sort_values(
-                "シナリオ", key=lambda s: s.map(order_map)
-            ).reset_index(drop=True)
             st.dataframe(df_opt_mw, use_container_width=True)
 
-        # 比較グラフ：遅延率と月間損失
-        fig2, ax2 = plt.subplots()
-
+        # 比較グラフ：遅延率と月間損失（Streamlit ネイティブのグラフで描画し、matplotlib を経由しない）
+        chart_df = df[["シナリオ", "遅延率(%)"]].copy()
         # 百万円単位に変換し、小数1桁に丸める
-        loss_million = (df[f"月間損失({workdays}日)"] / 1_000_000).round(1)
-        
-        # シナリオごとの色指定
-        color_map = {
-            "通常": "blue",
-            "繁忙": "red",
-            "低調": "green"
-        }
-        
-        colors = [color_map.get(s, "gray") for s in df["シナリオ"]]
-        
-        ax2.bar(df["シナリオ"], loss_million, color=colors)
-        
-        ax2.set_title("シナリオ別：月間損失（推定）")
-        ax2.set_xlabel("シナリオ")
-        ax2.set_ylabel("損失（百万円）")
-        
-        # 科学表記を強制的にオフ
-        ax2.ticklabel_format(style='plain', axis='y')
-        
-        # 棒の上に数値ラベル表示（小数1桁）
-        for i, v in enumerate(loss_million):
-            ax2.text(i, v + 0.05, f"{v:.1f}", ha='center', fontsize=9)
-        
-        st.pyplot(fig2)
+        chart_df["月間損失(百万円)"] = (df[money_col] / 1_000_000).round(1)
 
-        fig3, ax3 = plt.subplots()
+        st.markdown("**シナリオ別：月間損失（推定）**")
+        st.bar_chart(chart_df, x="シナリオ", y="月間損失(百万円)", y_label="損失（百万円）", sort=False)
 
-        # 色指定（損失グラフと統一）
-        color_map = {
-            "通常": "blue",
-            "繁忙": "red",
-            "低調": "green"
-        }
-        
-        colors = [color_map.get(s, "gray") for s in df["シナリオ"]]
-        
-        ax3.bar(df["シナリオ"], df["遅延率(%)"], color=colors)
-        
-        ax3.set_title("シナリオ別：遅延率（SLA超）")
-        ax3.set_xlabel("シナリオ")
-        ax3.set_ylabel("遅延率（%）")
-        
-        # 棒の上に数値表示
-        for i, v in enumerate(df["遅延率(%)"]):
-            ax3.text(i, v + 0.5, f"{v:.1f}%", ha='center', fontsize=9)
-        
-        st.pyplot(fig3)
+        st.markdown("**シナリオ別：遅延率（SLA超）**")
+        st.bar_chart(chart_df, x="シナリオ", y="遅延率(%)", y_label="遅延率（%）", sort=False)
 
         # --- 次のステップ（最終クロージング導線） ---
         st.markdown("---")
@@ -2,5 +2,12 @@
 # exit on error
 set -o errexit
 
-# ライブラリのインストールのみ実行
+# ライブラリのインストール
 pip install -r requirements.txt
+
+# Numba カーネル（待ち行列・集計）の事前コンパイルは任意（SIM_KERNEL_AOT=1 のときのみ）
+# 起動時の JIT は省けるが、AOT 版は GIL を保持するためスレッド並列の効果がなくなる
+# 失敗しても起動時の JIT にフォールバックする
+if [ "${SIM_KERNEL_AOT:-0}" = "1" ]; then
+    python build_sim_kernel.py || echo "sim_kernel の事前コンパイルをスキップしました"
+fi
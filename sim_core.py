@@ -0,0 +1,389 @@
+import hashlib
+import inspect
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit as st
+from numba import njit
+
+# --- シミュレーション（核） ---
+# 空き時刻テーブルの枠数（スタッフ上限15人を収める SIMD 幅）
+_FREE_SLOTS = 16
+
+# M/G/c（FCFS）は注文間の相互作用がないため、到着・梱包時間を一括生成し
+# 「各スタッフが空く時刻」を更新するだけで待ち時間が求まる
+# fastmath は +inf の番兵を使うため、inf/NaN を仮定しないフラグ（ninf, nnan）を除いて有効化
+@njit(cache=True, fastmath={"nsz", "arcp", "contract", "afn", "reassoc"}, nogil=True, boundscheck=False)
+def _assign_waits(u_inter, mean_iat, service, c, horizon, wait_times):
+    # wait_times は呼び出し側で確保したバッファ。
+    # 書き込んだ件数と、稼働時間の終わりまで到達できたか（乱数が足りたか）を返す
+    # 空き時刻テーブルは SIMD 幅に合わせて16枠に固定し、未使用枠は +inf（選ばれない）で埋める
+    # → 最小値探索が固定長ループになり、LLVM がベクトル化できる
+    slots = _FREE_SLOTS if c <= _FREE_SLOTS else c
+    free = np.full(slots, np.inf, dtype=np.float32)
+    free[:c] = 0.0
+    t = 0.0
+    n = 0
+    for i in range(u_inter.size):
+        # 到着間隔は逆関数法でその場で生成（u∈[0,1) なので 1-u として log(0) を避ける）
+        t += -math.log(1.0 - u_inter[i]) * mean_iat
+        if t >= horizon:
+            return n, True
+        # c は最大15なので heap より単純な線形探索が速い
+        min_v = free[0]
+        idx = 0
+        for j in range(1, slots):
+            if free[j] < min_v:
+                min_v = free[j]
+                idx = j
+        start = max(t, min_v)
+        # 稼働時間内に着手できた注文のみ集計（FCFSなので着手時刻は単調増加）
+        if start > horizon:
+            return n, True
+        wait_times[n] = start - t
+        free[idx] = start + service[i]
+        n += 1
+    return n, False
+
+def _service_f32(rng, mean, size):
+    # 梱包時間：正規分布（標準偏差=平均の20%）、下限0.1分。float32 で生成しその場で変換
+    service = rng.standard_normal(size, dtype=np.float32)
+    service *= np.float32(0.2 * mean)
+    service += np.float32(mean)
+    np.maximum(service, np.float32(0.1), out=service)
+    return service
+
+def run_simulation_fast(orders_per_hour, c, mean, hours, rng):
+    horizon = hours * 60.0
+    mean_iat = 60.0 / orders_per_hour
+    # ポアソン過程：到着間隔（指数分布）はカーネル内で一様乱数から生成し、稼働時間で打ち切る
+    # 件数は期待値 + 10σ 程度を見込み、万一足りなければ乱数を追加して計算し直す
+    # （先頭は同じ乱数のままなので、標本パスは途切れずに延長される）
+    n_expected = horizon / mean_iat
+    n_est = int(1.3 * n_expected + 10 * math.sqrt(n_expected)) + 1
+    u_inter = rng.random(n_est, dtype=np.float32)
+    service = _service_f32(rng, mean, n_est)
+    while True:
+        wait_times = np.empty(u_inter.size, dtype=np.float32)
+        n, finished = _kernel(u_inter, mean_iat, service, int(c), float(horizon), wait_times)
+        if finished:
+            return wait_times[:n]
+        u_inter = np.concatenate((u_inter, rng.random(n_est, dtype=np.float32)))
+        service = np.concatenate((service, _service_f32(rng, mean, n_est)))
+
+def _simulate(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, seed):
+    # 再現性重視
+    rng = np.random.default_rng(seed)
+    return run_simulation_fast(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, rng)
+
+# 同一条件（ベース・人員探索・シナリオ）の重複シミュレーションはキャッシュから返す
+# 結果は読み取り専用にして、コピーせず全ての呼び出し元で同じ配列を共有する
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _run_simulation_cached(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, seed):
+    wait_times = _simulate(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, seed)
+    wait_times.setflags(write=False)
+    return wait_times
+
+def run_simulation(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, seed=42):
+    # 型を揃えてキャッシュキーを一致させる（60 と 60.0 を同一視）
+    return _run_simulation_cached(
+        float(avg_orders_per_hour), int(num_packers), float(avg_packing_time), float(sim_hours), int(seed)
+    )
+
+# --- 反復実行（信頼区間） ---
+# 各反復は本体と同じカーネル（run_simulation_fast）で計算し、平均待ち・最大待ちだけを返す
+def _replicate_summary(orders_per_hour, c, mean, hours, rng):
+    wait_times = run_simulation_fast(orders_per_hour, c, mean, hours, rng)
+    if wait_times.size == 0:
+        return 0.0, 0.0
+    total, max_wait, _ = _summary_kernel(wait_times, 0.0)
+    return float(total / wait_times.size), float(max_wait)
+
+# 反復は互いに独立なのでスレッドで並列実行する（JIT カーネルは nogil。AOT 版は GIL を保持するため逐次に近くなる）。
+# 乱数は seed の Generator から spawn した独立ストリームを反復ごとに使うので、並列実行でも結果は再現可能。
+# prange（parallel=True）は TBB 利用時にメインスレッド以外から初回実行するとハングするため使わない
+@st.cache_data(show_spinner=False)
+def replicate_ci(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, n_reps=30, seed=42):
+    args = (float(avg_orders_per_hour), int(num_packers), float(avg_packing_time), float(sim_hours))
+    rngs = np.random.default_rng(int(seed)).spawn(n_reps)
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        summaries = list(ex.map(lambda rng: _replicate_summary(*args, rng), rngs))
+    means = np.array([m for m, _ in summaries])
+    maxes = np.array([mx for _, mx in summaries])
+    # 正規近似による95%信頼区間（平均, 下限, 上限）
+    result = {}
+    for key, values in (("avg_wait", means), ("max_wait", maxes)):
+        center = float(values.mean())
+        half = 1.96 * float(values.std(ddof=1)) / math.sqrt(n_reps) if n_reps > 1 else 0.0
+        result[key] = (center, center - half, center + half)
+    return result
+
+# --- 指標計算 ---
+# 合計・最大・SLA超過件数を1パスで集計（配列を3回走査しない）
+@njit(cache=True, nogil=True)
+def _summarize(wait_times, sla_min):
+    total = 0.0
+    max_wait = 0.0
+    late_count = 0
+    for w in wait_times:
+        total += w
+        if w > max_wait:
+            max_wait = w
+        if w > sla_min:
+            late_count += 1
+    return total, max_wait, late_count
+
+# --- カーネルの選択（事前コンパイル版 / JIT） ---
+def _kernel_source_hash():
+    # カーネルのソースから求めたハッシュ。事前コンパイル版に埋め込み、読み込み時に照合する
+    src = inspect.getsource(_assign_waits.py_func) + inspect.getsource(_summarize.py_func) + repr(_FREE_SLOTS)
+    return int(hashlib.sha256(src.encode("utf-8")).hexdigest()[:15], 16)
+
+def _load_aot():
+    # build_sim_kernel.py で事前コンパイル（AOT）した sim_kernel があれば読み込む（任意）。
+    # カーネルを変更した後の古い生成物は、ハッシュが一致しないので使わない
+    try:
+        import sim_kernel
+    except ImportError:
+        return None
+    source_hash = getattr(sim_kernel, "source_hash", None)
+    if source_hash is None or source_hash() != _kernel_source_hash():
+        return None
+    return sim_kernel
+
+# AOT 版は起動時の JIT を省けるが GIL を保持するため、スレッド並列（シナリオ比較・信頼区間）は逐次に近くなる
+_aot = _load_aot()
+if _aot is not None:
+    _kernel = _aot.assign_waits
+    _summary_kernel = _aot.summarize
+else:
+    _kernel = _assign_waits
+    _summary_kernel = _summarize
+    # 初回クリック時のJITコンパイルを避けるため、起動時に一度だけコンパイルしておく
+    _kernel(np.zeros(1, dtype=np.float32), 1.0, np.zeros(1, dtype=np.float32), 1, 1.0, np.empty(1, dtype=np.float32))
+    _summary_kernel(np.zeros(1, dtype=np.float32), 0.0)
+
+def evaluate(wait_times, sla_min, loss_per_order_yen, workdays=20):
+    total = int(len(wait_times))
+    if total == 0:
+        return {
+            "total_orders": 0,
+            "avg_wait": 0.0,
+            "max_wait": 0.0,
+            "delay_rate": 0.0,
+            "late_orders": 0,
+            "daily_loss": 0,
+            "monthly_loss": 0
+        }
+
+    wait_sum, max_wait, late_count = _summary_kernel(wait_times, float(sla_min))
+    avg_wait = float(wait_sum / total)
+    max_wait = float(max_wait)
+    late_count = int(late_count)
+    delay_rate = late_count / total * 100.0
+    daily_loss = int(late_count * loss_per_order_yen)
+    monthly_loss = int(daily_loss * workdays)
+
+    return {
+        "total_orders": total,
+        "avg_wait": avg_wait,
+        "max_wait": max_wait,
+        "delay_rate": delay_rate,
+        "late_orders": late_count,
+        "daily_loss": daily_loss,
+        "monthly_loss": monthly_loss
+    }
+
+# これを超えるビン数では np.histogram の代わりに bincount で集計する
+HIST_BINCOUNT_MIN_BINS = 50
+
+def wait_histogram(wait_times, bins, lo, hi):
+    # 等幅ビンの度数分布（範囲外は両端のビンに含める。どちらの集計方法でも同じ結果）
+    if hi <= lo:
+        hi = lo + 1.0
+    if bins <= HIST_BINCOUNT_MIN_BINS:
+        return np.histogram(np.clip(wait_times, lo, hi), bins=bins, range=(lo, hi))
+    # ビン数が多いときは、ビン番号を直接計算して bincount で数える（境界の探索が不要な1パス）
+    idx = ((wait_times - lo) * (bins / (hi - lo))).astype(np.int32)
+    np.clip(idx, 0, bins - 1, out=idx)
+    counts = np.bincount(idx, minlength=bins)
+    return counts, np.linspace(lo, hi, bins + 1)
+
+# --- 解析近似（M/G/c：Erlang-C + Allen-Cunneen） ---
+# 総注文数がこれ以上なら、人員探索は解析式で当たりを付け、その前後だけをシミュレーションで確かめる
+ANALYTIC_MIN_ORDERS = 5000
+
+def erlang_c(lam, mu, c):
+    # 到着が待たされる確率 P(W>0)。階乗を使わず逐次計算（オーバーフロー回避）
+    a = lam / mu
+    rho = a / c
+    if rho >= 1.0:
+        return 1.0
+    term = 1.0
+    s = 1.0
+    for k in range(1, c):
+        term *= a / k
+        s += term
+    last = term * a / c / (1.0 - rho)
+    return last / (s + last)
+
+# 負荷率がこれ以上なら実質的に飽和（待ち行列が際限なく伸びる）とみなす
+SATURATION_RHO = 0.98
+
+def load_factor(avg_orders_per_hour, num_packers, avg_packing_time):
+    # 負荷率 ρ = λ/(cμ)
+    return avg_orders_per_hour * avg_packing_time / 60.0 / num_packers
+
+def is_stable(avg_orders_per_hour, num_packers, avg_packing_time):
+    # ρ < 1 のときのみ定常状態（解析近似）が存在する
+    return load_factor(avg_orders_per_hour, num_packers, avg_packing_time) < 1.0
+
+def _mgc_params(avg_orders_per_hour, num_packers, avg_packing_time, cv2):
+    lam = avg_orders_per_hour / 60.0
+    mu = 1.0 / avg_packing_time
+    c = int(num_packers)
+    p_wait = erlang_c(lam, mu, c)
+    # Allen-Cunneen：E[Wq] = P_wait / (cμ-λ) × (ca²+cs²)/2（ポアソン到着なので ca²=1）
+    theta = (c * mu - lam) * 2.0 / (1.0 + cv2)
+    return p_wait, theta
+
+def analytical_metrics(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, sla_min, loss_per_order_yen,
+                       workdays=20, cv2=0.04):
+    # 梱包時間は正規分布（標準偏差=平均の20%）なので変動係数²は 0.04
+    p_wait, theta = _mgc_params(avg_orders_per_hour, num_packers, avg_packing_time, cv2)
+    total = int(round(avg_orders_per_hour * sim_hours))
+    # 待ち時間の裾は P(W>t) ≈ P_wait・exp(-θt) と近似
+    late_prob = p_wait * math.exp(-theta * sla_min)
+    late_count = int(round(total * late_prob))
+    # 最大待ち：N件中の最大値 ≈ 超過確率が 1/N となる待ち時間
+    max_wait = math.log(p_wait * total) / theta if p_wait * total > 1.0 else 0.0
+    daily_loss = int(late_count * loss_per_order_yen)
+
+    return {
+        "total_orders": total,
+        "avg_wait": p_wait / theta,
+        "max_wait": max_wait,
+        "delay_rate": late_prob * 100.0,
+        "late_orders": late_count,
+        "daily_loss": daily_loss,
+        "monthly_loss": int(daily_loss * workdays)
+    }
+
+def analytical_histogram(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, max_wait, bins=20, cv2=0.04):
+    # 解析近似の分布から各ビンの期待件数を求める（待ちなしの注文は先頭ビン、範囲外の裾は最終ビンに含める）
+    p_wait, theta = _mgc_params(avg_orders_per_hour, num_packers, avg_packing_time, cv2)
+    total = avg_orders_per_hour * sim_hours
+    edges = np.linspace(0.0, max_wait if max_wait > 0 else 1.0, bins + 1)
+    cdf = 1.0 - p_wait * np.exp(-theta * edges)
+    cdf[0] = 0.0
+    cdf[-1] = 1.0
+    counts = np.round(np.diff(cdf) * total).astype(np.int64)
+    return counts, edges
+
+def _staff_metrics(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, sla, loss_per_order, seed):
+    # 推奨の判定はベース・シナリオ表と同じシミュレーション結果で行う（表示と推奨を食い違わせない）
+    wt = run_simulation(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, seed=seed)
+    return evaluate(wt, sla, loss_per_order)
+
+def _bisect_staff(passes, min_staff, max_staff):
+    # 遅延率・最大待ちは人数に対して単調減少なので、二分探索で条件を満たす最小人数を求める
+    if not passes(max_staff):
+        return None
+    lo, hi = min_staff, max_staff
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if passes(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+def _search_from(passes, guess, min_staff, max_staff):
+    # 推定人数から出発し、合格なら減らせるだけ減らし、不合格なら合格するまで増やす
+    # （単調性より二分探索と同じ人数になる。推定が当たっていれば評価は2回で済む）
+    staff = min(max(guess, min_staff), max_staff)
+    if passes(staff):
+        while staff > min_staff and passes(staff - 1):
+            staff -= 1
+        return staff
+    while staff < max_staff:
+        staff += 1
+        if passes(staff):
+            return staff
+    return None
+
+def _analytic_passes(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, sla, loss_per_order, key, limit):
+    # 定常状態がない人数（ρ≥1）は解析式では評価できないため不合格とする
+    if not is_stable(avg_orders_per_hour, num_packers, avg_packing_time):
+        return False
+    m = analytical_metrics(avg_orders_per_hour, num_packers, avg_packing_time, sim_hours, sla, loss_per_order)
+    return m[key] <= limit
+
+# --- 人員最適化（目標遅延率を満たす最小人数） ---
+def recommend_staff(avg_orders_per_hour, avg_packing_time, sim_hours, sla, loss_per_order, target_delay_rate,
+                    min_staff=1, max_staff=15, seed=42):
+    by_rate, _ = recommend_staff_dual(
+        avg_orders_per_hour, avg_packing_time, sim_hours, sla, loss_per_order, target_delay_rate,
+        None, min_staff=min_staff, max_staff=max_staff, seed=seed
+    )
+    return by_rate
+
+# 解析近似モード用：ベースの指標と同じく解析式だけで判定する（シミュレーションしない）
+def recommend_staff_analytic(avg_orders_per_hour, avg_packing_time, sim_hours, sla, loss_per_order, target_delay_rate,
+                             min_staff=1, max_staff=15, workdays=20):
+    staff = _bisect_staff(
+        lambda s: _analytic_passes(
+            avg_orders_per_hour, s, avg_packing_time, sim_hours, sla, loss_per_order, "delay_rate", target_delay_rate
+        ),
+        min_staff, max_staff
+    )
+    if staff is None:
+        return None, None
+    return staff, analytical_metrics(
+        avg_orders_per_hour, staff, avg_packing_time, sim_hours, sla, loss_per_order, workdays=workdays
+    )
+
+# 目標遅延率ベースと締切遵守（最大待ち）ベースを同じ評価結果を共有して判定
+# （max_wait_limit が None の場合は遅延率ベースのみ）
+def recommend_staff_dual(avg_orders_per_hour, avg_packing_time, sim_hours, sla, loss_per_order, target_delay_rate,
+                         max_wait_limit, min_staff=1, max_staff=15, seed=42):
+    metrics = {}
+
+    def get(staff):
+        if staff not in metrics:
+            metrics[staff] = _staff_metrics(
+                avg_orders_per_hour, staff, avg_packing_time, sim_hours, sla, loss_per_order, seed
+            )
+        return metrics[staff]
+
+    def passes(staff, key, limit):
+        # 飽和に近い人数でも、稼働時間内の結果が目標を満たすなら合格とする（有限時間の評価を優先）
+        return get(staff)[key] <= limit
+
+    def search(key, limit):
+        # 大規模（件数が多い）ときは解析式の推定人数から探索を始め、シミュレーション回数を減らす
+        if avg_orders_per_hour * sim_hours >= ANALYTIC_MIN_ORDERS:
+            guess = _bisect_staff(
+                lambda s: _analytic_passes(
+                    avg_orders_per_hour, s, avg_packing_time, sim_hours, sla, loss_per_order, key, limit
+                ),
+                min_staff, max_staff
+            )
+            return _search_from(
+                lambda s: passes(s, key, limit), max_staff if guess is None else guess, min_staff, max_staff
+            )
+        return _bisect_staff(lambda s: passes(s, key, limit), min_staff, max_staff)
+
+    by_rate = (None, None)
+    staff = search("delay_rate", target_delay_rate)
+    if staff is not None:
+        by_rate = (staff, get(staff))
+
+    by_maxwait = (None, None)
+    if max_wait_limit is not None:
+        staff = search("max_wait", max_wait_limit)
+        if staff is not None:
+            by_maxwait = (staff, get(staff)["max_wait"])
+    return by_rate, by_maxwait